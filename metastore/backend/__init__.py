@@ -1,13 +1,42 @@
 """Backend namespace
 """
+import sys
 from typing import Any, Dict, List, Optional
 
-from metastore.types import Author, DataPackageType, PackageRevisionInfo, TagInfo
 from metastore.util import get_callable
 
 BACKEND_CLASSES = {'github': 'metastore.backend.github:GitHubStorage',
                    'filesystem': 'metastore.backend.filesystem:FilesystemStorage'}
 
+# Names lazily re-exported from other modules via the PEP 562 module
+# __getattr__ below; the interface type comments in this module only need
+# them as strings, not at runtime
+_LAZY_ATTRIBUTES = {'Author': 'metastore.types',
+                    'DataPackageType': 'metastore.types',
+                    'PackageRevisionInfo': 'metastore.types',
+                    'TagInfo': 'metastore.types'}
+
+if sys.version_info < (3, 7):
+    # No PEP 562 module __getattr__ before Python 3.7; import the re-exported
+    # names eagerly so they stay available on Python 2.7 / 3.6
+    from metastore.types import Author, DataPackageType, PackageRevisionInfo, TagInfo  # noqa: F401
+
+
+def __getattr__(name):
+    # type: (str) -> Any
+    """Lazily resolve re-exported names, keeping this module import near-free
+    """
+    try:
+        module_name = _LAZY_ATTRIBUTES[name]
+    except KeyError:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    import importlib
+    return getattr(importlib.import_module(module_name), name)
+
+
+# Resolved backend classes, memoized by create_metastore
+_resolved_backends = {}  # type: Dict[str, Any]
+
 
 class StorageBackend(object):
     """Abstract interface for storage backend classes
@@ -118,13 +147,19 @@ def create_metastore(backend_type, options):
     # type: (str, Dict[str, Any]) -> StorageBackend
     """Factory for storage backends
 
-    Note that this will import the right backend module only as needed
+    Note that this will import the right backend module only as needed;
+    resolved backend classes are memoized, so repeated calls for the same
+    backend type skip the import machinery entirely
     """
-    if ':' not in backend_type:
-        try:
-            backend_type = BACKEND_CLASSES[backend_type]
-        except KeyError:
-            raise ValueError("Unknown backend type: {}".format(type))
-
-    backend = get_callable(backend_type)
+    backend = _resolved_backends.get(backend_type)
+    if backend is None:
+        callable_str = backend_type
+        if ':' not in callable_str:
+            try:
+                callable_str = BACKEND_CLASSES[callable_str]
+            except KeyError:
+                raise ValueError("Unknown backend type: {}".format(backend_type))
+
+        backend = get_callable(callable_str)
+        _resolved_backends[backend_type] = backend
     return backend(**options)  # type: ignore
@@ -3,23 +3,75 @@
 This is useful especially for testing and POC implementations
 """
 import hashlib
-import json
 import re
+import string
+import threading
 import uuid
+from collections import OrderedDict
 from datetime import datetime
 from operator import attrgetter
-from typing import Any, Dict, List, Optional
-
-import pytz
-import six
-from dateutil.parser import isoparse
-from fs import open_fs
-from fs.errors import DirectoryExists, ResourceNotFound
+from typing import Any, Dict, List, Optional, Tuple  # noqa: F401
 
 from ..types import Author, PackageRevisionInfo, TagInfo
-from ..util import is_hex_str
+from ..util import is_hex_str, json_dumpb, json_loadb
 from . import StorageBackend, exc
 
+# Cached revision DB entry: (file mtime, file size, ordered revisions,
+# revision id -> revision)
+_RevCacheEntry = Tuple[datetime, int, List[PackageRevisionInfo], Dict[str, PackageRevisionInfo]]
+
+# Cached tags directory entry: (directory mtime, tag name -> (file mtime,
+# parsed tag), sorted tags)
+_TagCacheEntry = Tuple[Any, Dict[str, Tuple[Optional[datetime], TagInfo]], List[TagInfo]]
+
+# Directory mtime marker for invalidated tag cache entries; a dedicated
+# sentinel rather than None, because PyFilesystem reports None mtimes on
+# filesystems without detail support and the marker must never compare equal
+# to a live mtime
+_TAG_CACHE_DIRTY = object()
+
+# PyFilesystem is imported lazily on first backend instantiation, so that
+# importing this module stays cheap for consumers that never use it. The
+# exception classes are bound as module globals for `except` clauses.
+DirectoryExists = None  # type: Any
+ResourceNotFound = None  # type: Any
+
+
+# ASCII characters always accepted in tag names; a frozenset containment
+# check is much cheaper than the regex engine for the common case
+_TAG_NAME_ASCII_CHARS = frozenset(string.ascii_letters + string.digits + '_-+.,')
+
+try:
+    from datetime import timezone
+    _UTC = timezone.utc
+except ImportError:  # Python 2, fall back to pytz
+    import pytz
+    _UTC = pytz.utc
+
+# datetime.fromisoformat (Python 3.7+) is considerably faster than
+# dateutil.parser.isoparse and handles the timestamp format we write
+_fromisoformat = getattr(datetime, 'fromisoformat', None)
+
+
+def _parse_datetime(value):
+    # type: (str) -> datetime
+    """Parse an ISO-8601 timestamp as written by this backend
+    """
+    if _fromisoformat is not None:
+        return _fromisoformat(value)
+    from dateutil.parser import isoparse
+    return isoparse(value)
+
+
+def _import_fs():
+    """Import PyFilesystem lazily and return the ``open_fs`` entry point
+    """
+    global DirectoryExists, ResourceNotFound
+    from fs import errors, open_fs
+    DirectoryExists = errors.DirectoryExists
+    ResourceNotFound = errors.ResourceNotFound
+    return open_fs
+
 
 class FilesystemStorage(StorageBackend):
     """Abstract filesystem based storage based on PyFilesystem
@@ -34,12 +86,28 @@ class FilesystemStorage(StorageBackend):
     """
     REVISION_DB_FILE = 'revisions.jsonl'
 
+    REVISION_CACHE_SIZE = 128
+
+    LOCK_STRIPES = 256
+
     TAG_NAME_RE = re.compile(r'^[\w\-+.,]+\Z')
 
     def __init__(self, uri, default_author=None):
         # type: (str, Optional[Author]) -> None
-        self._fs = open_fs(uri)
+        self._fs = _import_fs()(uri)
         self._default_author = default_author
+        # Striped per-package write locks; far less contended than the global
+        # PyFilesystem lock, bounded in memory by the fixed stripe count
+        self._pkg_locks = [threading.RLock() for _ in range(self.LOCK_STRIPES)]
+        # Parsed revision log cache, keyed by DB file path; values are
+        # (file mtime, parsed revisions, revision id -> revision index) tuples
+        self._rev_cache = OrderedDict()  # type: OrderedDict[str, _RevCacheEntry]
+        self.rev_cache_hits = 0
+        self.rev_cache_misses = 0
+        # Parsed tag cache, keyed by tags directory path; values are
+        # (directory mtime, tag name -> (file mtime, parsed tag), sorted tags)
+        # tuples
+        self._tag_cache = {}  # type: Dict[str, _TagCacheEntry]
 
     def create(self, package_id, metadata, author=None, message=None):
         try:
@@ -48,45 +116,40 @@ class FilesystemStorage(StorageBackend):
             raise exc.Conflict("Package with id {} already exists".format(package_id))
 
         revision = _make_revision_id()
-        with self._fs.lock():
-            with package_dir.open(revision, 'wb') as f:
-                f.write(json.dumps(metadata).encode('utf8'))
+        # The blob file name is unique, so only the revision log append needs
+        # to be protected by the lock
+        with package_dir.open(revision, 'wb') as f:
+            f.write(json_dumpb(metadata))
+        with self._lock_for(package_id):
             rev_info = self._log_revision(package_id, revision, author, message)
         rev_info.package = metadata
         return rev_info
 
     def fetch(self, package_id, revision_ref=None):
-        if not revision_ref:
-            # Get the latest revision
-            revision = self.revision_list(package_id)[0]
-            revision_ref = revision.revision
-        elif not self.is_valid_revision_id(revision_ref):
-            tag = self.tag_fetch(package_id, revision_ref)
-            revision_ref = tag.revision_ref
-            revision = tag.revision
-        else:
-            revision = self.revision_fetch(package_id, revision_ref)
-
-        package_path = u'{}/{}'.format(_get_package_path(package_id), revision_ref)
+        revision = self._resolve_revision(package_id, revision_ref)
+        package_path = u'{}/{}'.format(_get_package_path(package_id), revision.revision)
         try:
-            with self._fs.open(package_path, 'r') as f:
-                revision.package = json.load(f)
+            with self._fs.open(package_path, 'rb') as f:
+                revision.package = json_loadb(f.read())
         except (ResourceNotFound, ValueError):
-            raise exc.NotFound('Could not find package {}@{}'.format(package_id, revision_ref))
+            raise exc.NotFound('Could not find package {}@{}'.format(package_id, revision.revision))
 
         return revision
 
     def update(self, package_id, metadata, author=None, partial=False, base_revision_ref=None, message=None):
-        current = self.fetch(package_id, base_revision_ref)
-
         if partial:
+            current = self.fetch(package_id, base_revision_ref)
             current.package.update(metadata)
             metadata = current.package
+        else:
+            # A full overwrite doesn't need the current package blob; just
+            # verify the package (and base revision, if given) exists
+            self._resolve_revision(package_id, base_revision_ref)
 
-        with self._fs.lock():
-            revision = _make_revision_id()
-            with self._fs.open(u'{}/{}'.format(_get_package_path(package_id), revision), 'wb') as f:
-                f.write(json.dumps(metadata).encode('utf8'))
+        revision = _make_revision_id()
+        with self._fs.open(u'{}/{}'.format(_get_package_path(package_id), revision), 'wb') as f:
+            f.write(json_dumpb(metadata))
+        with self._lock_for(package_id):
             rev_info = self._log_revision(package_id, revision, author, message)
         rev_info.package = metadata
         return rev_info
@@ -103,7 +166,7 @@ class FilesystemStorage(StorageBackend):
             revisions = self._get_revisions(package_id)
         except ResourceNotFound:
             raise exc.NotFound('Could not find package {}'.format(package_id))
-        return revisions
+        return [_copy_revision(r) for r in revisions]
 
     def revision_fetch(self, package_id, revision_ref):
         try:
@@ -112,7 +175,7 @@ class FilesystemStorage(StorageBackend):
             raise exc.NotFound('Could not find package {}'.format(package_id))
         if revision is None:
             raise exc.NotFound('Could not find package {}@{}'.format(package_id, revision_ref))
-        return revision
+        return _copy_revision(revision)
 
     def tag_create(self, package_id, revision_ref, name, author=None, description=None):
         if not self._validate_tag_name(name):
@@ -121,17 +184,7 @@ class FilesystemStorage(StorageBackend):
         return self._log_tag(revision, name, author, description)
 
     def tag_list(self, package_id):
-        tags = []
-        tag_dir = self._open_tag_dir(package_id)
-        if tag_dir is None:
-            return []
-
-        for tag_name in tag_dir.listdir('.'):
-            with tag_dir.open(tag_name, 'r') as f:
-                tag_line = json.load(f)
-            tags.append(_tag_file_to_taginfo(package_id, tag_name, tag_line))
-
-        return sorted(tags, key=attrgetter('created'))
+        return [_copy_tag(t) for t in self._get_tags(package_id)]
 
     def tag_fetch(self, package_id, tag):
         if not self._validate_tag_name(tag):
@@ -155,7 +208,7 @@ class FilesystemStorage(StorageBackend):
         description = new_description or tag_info.description or None
         overwrite = tag_info.name == name
 
-        with self._fs.lock():
+        with self._lock_for(package_id, 'tags'):
             tag_info = self._log_tag(tag_info.revision, name, author, description, allow_overwrite=overwrite)
             if not overwrite:
                 self.tag_delete(package_id, tag)
@@ -163,86 +216,223 @@ class FilesystemStorage(StorageBackend):
         return tag_info
 
     def tag_delete(self, package_id, tag):
-        with self._fs.lock():
+        with self._lock_for(package_id, 'tags'):
             tags_dir = self._open_tag_dir(package_id)
             try:
                 tags_dir.remove(tag)
             except ResourceNotFound:
                 raise exc.NotFound('Could not find tag {} for package {}'.format(tag, package_id))
+            self._invalidate_tag_cache(_get_tags_path(package_id), tag)
 
     @classmethod
     def is_valid_revision_id(cls, revision_id):
         return is_hex_str(revision_id, chars=32)
 
+    def _db_file_path(self, package_id):
+        # type: (str) -> str
+        """Path to the revisions DB file of a package
+        """
+        return u'{}/{}'.format(_get_package_path(package_id), self.REVISION_DB_FILE)
+
+    def _lock_for(self, package_id, scope=''):
+        # type: (str, str) -> threading.RLock
+        """Get the write lock stripe for a package (and optional scope)
+
+        Locks are reentrant so tag operations can compose.
+        """
+        return self._pkg_locks[hash((package_id, scope)) % self.LOCK_STRIPES]
+
+    def _resolve_revision(self, package_id, revision_ref=None):
+        # type: (str, Optional[str]) -> PackageRevisionInfo
+        """Resolve a revision ref (revision ID, tag name or None for latest)
+        into revision info, using the cached revision index
+        """
+        if not revision_ref:
+            # Get the latest revision
+            return self.revision_list(package_id)[0]
+        elif not self.is_valid_revision_id(revision_ref):
+            return self.tag_fetch(package_id, revision_ref).revision
+        return self.revision_fetch(package_id, revision_ref)
+
     def _log_revision(self, package_id, revision, author, message=None):
         # type: (str, str, Optional[Author], Optional[str]) -> PackageRevisionInfo
         """Log a revision
         """
-        db_file = u'{}/{}'.format(_get_package_path(package_id), self.REVISION_DB_FILE)
-        now = datetime.now(tz=pytz.utc).isoformat()
+        db_file = self._db_file_path(package_id)
+        now = datetime.now(tz=_UTC).isoformat()
         author = self._verify_author(author)
 
-        with self._fs.open(db_file, 'ab') as f:
-            rev_info = {"revision": revision,
-                        "created": now,
-                        "description": message,
-                        "author_name": author.name,
-                        "author_email": author.email}
-            f.write('{}\n'.format(json.dumps(rev_info)).encode('utf8'))
+        # Serialize the record up front so the file (and any lock held by the
+        # caller) is only busy for a single write
+        rev_info = {"revision": revision,
+                    "created": now,
+                    "description": message,
+                    "author_name": author.name,
+                    "author_email": author.email}
+        line = json_dumpb(rev_info) + b'\n'
+
+        self._fs.appendbytes(db_file, line)
+
+        # Keep a warm cache entry up to date instead of invalidating it
+        cached = self._rev_cache.pop(db_file, None)
+        if cached is not None:
+            fileinfo = self._fs.getinfo(db_file, namespaces=['details'])
+            self._store_rev_cache(db_file, fileinfo, [_parse_rev_log(package_id, rev_info)] + cached[2])
         return PackageRevisionInfo(package_id, revision, now, author, message)
 
     def _get_revisions(self, package_id):
         # type: (str) -> List[PackageRevisionInfo]
         """Get list of revisions from DB file
+
+        Note that this returns the cached list and objects; callers must copy
+        before exposing them (see :func:`_copy_revision`)
         """
-        db_file = u'{}/{}'.format(_get_package_path(package_id), self.REVISION_DB_FILE)
-        with self._fs.open(db_file, 'r') as f:
-            lines = [json.loads(line) for line in f]
-            revisions = [_parse_rev_log(package_id, line) for line in reversed(lines)]
-        return revisions
+        return self._load_rev_db(package_id)[2]
 
     def _get_revision(self, package_id, revision):
-        # type: (str, str) -> PackageRevisionInfo
+        # type: (str, str) -> Optional[PackageRevisionInfo]
         """Get a specific revision from the revisions DB file
 
         If not found, will return None
         """
-        db_file = u'{}/{}'.format(_get_package_path(package_id), self.REVISION_DB_FILE)
-        with self._fs.open(db_file, 'r') as f:
-            for line in f:
-                rev_data = json.loads(line)
-                if rev_data['revision'] == revision:
-                    return _parse_rev_log(package_id, rev_data)
+        return self._load_rev_db(package_id)[3].get(revision)
+
+    def _load_rev_db(self, package_id):
+        # type: (str) -> _RevCacheEntry
+        """Load the revisions DB file for a package, parsing and indexing it
+
+        Parsed revision logs are cached in memory and reused as long as the
+        DB file modification time has not changed; the cache is invalidated
+        by :meth:`_log_revision` on write.
+        """
+        db_file = self._db_file_path(package_id)
+        info = self._fs.getinfo(db_file, namespaces=['details'])
+        cached = self._rev_cache.get(db_file)
+        if cached is not None:
+            if cached[0] == info.modified and cached[1] == info.size:
+                self.rev_cache_hits += 1
+                # Re-insert to mark as recently used (move_to_end is py3
+                # only); pop defensively - a concurrent reader may have
+                # already moved or evicted the entry, and re-inserting the
+                # local reference is just as good
+                self._rev_cache.pop(db_file, None)
+                self._rev_cache[db_file] = cached
+                return cached
+            elif cached[1] is not None and info.size is not None and info.size > cached[1]:
+                # The log is append-only, so on growth we only need to parse
+                # the appended suffix rather than the entire file
+                self.rev_cache_hits += 1
+                with self._fs.open(db_file, 'rb') as f:
+                    f.seek(cached[1])
+                    tail = f.read()
+                new_revs = [_parse_rev_log(package_id, json_loadb(line)) for line in reversed(tail.splitlines())]
+                return self._store_rev_cache(db_file, info, new_revs + cached[2])
+        self.rev_cache_misses += 1
+
+        with self._fs.open(db_file, 'rb') as f:
+            data = f.read()
+        revisions = [_parse_rev_log(package_id, json_loadb(line)) for line in reversed(data.splitlines())]
+        return self._store_rev_cache(db_file, info, revisions)
+
+    def _store_rev_cache(self, db_file, info, revisions):
+        """Store a parsed, indexed revision log in the cache
+        """
+        entry = (info.modified, info.size, revisions, {r.revision: r for r in revisions})
+        self._rev_cache.pop(db_file, None)
+        self._rev_cache[db_file] = entry
+        if len(self._rev_cache) > self.REVISION_CACHE_SIZE:
+            self._rev_cache.popitem(last=False)
+        return entry
 
     def _validate_tag_name(self, name):
         # type: (str) -> bool
         """Validate a tag name
+
+        Most tag names are plain ASCII and are accepted by a C-level set
+        containment check; anything else (e.g. non-ASCII word characters)
+        falls through to the full regex match.
         """
+        if not name:
+            return False
+        if _TAG_NAME_ASCII_CHARS.issuperset(name):
+            return True
         return bool(self.TAG_NAME_RE.match(name))
 
     def _log_tag(self, revision, tag_name, author, tag_description, allow_overwrite=False):
         # type: (PackageRevisionInfo, str, Optional[Author], str, bool) -> TagInfo
         """Log a new tag for an existing revision
         """
-        tags_path = u'{}/{}'.format(_get_package_path(revision.package_id), 'tags')
-        now = datetime.now(tz=pytz.utc)
+        tags_path = _get_tags_path(revision.package_id)
+        now = datetime.now(tz=_UTC)
         tags_dir = self._fs.makedirs(tags_path, recreate=True)
         author = self._verify_author(author)
 
-        with tags_dir.lock():
+        tag_info = {"created": now.isoformat(),
+                    "revision": revision.revision,
+                    "description": tag_description,
+                    "author_name": author.name,
+                    "author_email": author.email}
+        payload = json_dumpb(tag_info)
+
+        with self._lock_for(revision.package_id, 'tags'):
             if not allow_overwrite and tags_dir.exists(tag_name):
                 raise exc.Conflict('Tag already exists: {}'.format(tag_name))
 
             with tags_dir.open(tag_name, 'wb') as f:
-                tag_info = {"created": now.isoformat(),
-                            "revision": revision.revision,
-                            "description": tag_description,
-                            "author_name": author.name,
-                            "author_email": author.email}
-                f.write(json.dumps(tag_info).encode('utf8'))
+                f.write(payload)
+        self._invalidate_tag_cache(tags_path, tag_name)
         return TagInfo(revision.package_id, tag_name, now, revision.revision, author, revision,
                        description=tag_description)
 
+    def _get_tags(self, package_id):
+        # type: (str) -> List[TagInfo]
+        """Get the sorted list of tags for a package
+
+        Parsed tag lists are cached against the tags directory modification
+        time. On a directory-level miss, individual tag files are still only
+        re-read if their own modification time has changed since they were
+        last parsed; :meth:`_log_tag` and :meth:`tag_delete` drop the
+        per-file entry of the tag they touch.
+        """
+        tag_dir = self._open_tag_dir(package_id)
+        if tag_dir is None:
+            return []
+
+        tags_path = _get_tags_path(package_id)
+        modified = tag_dir.getinfo(u'/', namespaces=['details']).modified
+        cached = self._tag_cache.get(tags_path)
+        if cached is not None and cached[0] == modified:
+            return cached[2]
+
+        old_files = cached[1] if cached is not None else {}
+        files = {}  # type: Dict[str, Tuple[Optional[datetime], TagInfo]]
+        tags = []
+        for info in tag_dir.scandir(u'/', namespaces=['details']):
+            if not info.is_file:
+                continue
+            old_entry = old_files.get(info.name)
+            if old_entry is not None and old_entry[0] == info.modified:
+                tag = old_entry[1]
+            else:
+                tag = _tag_file_to_taginfo(package_id, info.name, json_loadb(tag_dir.readbytes(info.name)))
+            files[info.name] = (info.modified, tag)
+            tags.append(tag)
+        tags.sort(key=attrgetter('created'))
+        self._tag_cache[tags_path] = (modified, files, tags)
+        return tags
+
+    def _invalidate_tag_cache(self, tags_path, tag_name):
+        # type: (str, str) -> None
+        """Invalidate the cached tag list after writing or removing a tag
+
+        The per-file parse cache is kept for all other tags, so the next
+        :meth:`_get_tags` call only re-reads the file that actually changed.
+        """
+        cached = self._tag_cache.get(tags_path)
+        if cached is not None:
+            cached[1].pop(tag_name, None)
+            self._tag_cache[tags_path] = (_TAG_CACHE_DIRTY, cached[1], cached[2])
+
     def _get_tag(self, package_id, tag_name):
         # type: (str, str) -> Optional[TagInfo]
         """Get a specific tag from the tags DB file
@@ -253,8 +443,7 @@ class FilesystemStorage(StorageBackend):
             tag_dir = self._open_tag_dir(package_id)
             if not tag_dir:
                 return None
-            with tag_dir.open(tag_name, 'r') as f:
-                line = json.load(f)
+            line = json_loadb(tag_dir.readbytes(tag_name))
         except ResourceNotFound:
             return None
 
@@ -284,11 +473,37 @@ class FilesystemStorage(StorageBackend):
         return Author(None, None)
 
 
+# SHA-256 is part of the on-disk layout: package paths are derived from it, so
+# swapping in a faster non-cryptographic hash would orphan existing stores
+_sha256 = hashlib.sha256
+
+# Memoized package id -> path mappings; hashing is pure so entries never go stale
+_package_path_cache = {}  # type: Dict[str, str]
+_PACKAGE_PATH_CACHE_SIZE = 4096
+
+
 def _get_package_path(package_id):
-    # type: (str) -> six.text_type
+    # type: (str) -> str
     """Create a package path
+
+    As this requires computing a SHA-256 digest of the package id, results
+    are memoized; repeated calls for the same package id (one or more per
+    backend operation) are reduced to a dict lookup.
     """
-    return u'/p/{}'.format(hashlib.sha256(package_id.encode('utf8')).hexdigest())
+    path = _package_path_cache.get(package_id)
+    if path is None:
+        path = u'/p/{}'.format(_sha256(package_id.encode('utf8')).hexdigest())
+        if len(_package_path_cache) >= _PACKAGE_PATH_CACHE_SIZE:
+            _package_path_cache.clear()
+        _package_path_cache[package_id] = path
+    return path
+
+
+def _get_tags_path(package_id):
+    # type: (str) -> str
+    """Path to the tags directory of a package
+    """
+    return u'{}/tags'.format(_get_package_path(package_id))
 
 
 def _make_revision_id():
@@ -298,34 +513,64 @@ def _make_revision_id():
     return uuid.uuid4().hex
 
 
+def _copy_revision(revision):
+    # type: (PackageRevisionInfo) -> PackageRevisionInfo
+    """Copy a cached revision before handing it to a caller
+
+    Callers mutate the objects they get back (:meth:`FilesystemStorage.fetch`
+    sets ``package``, partial updates modify it in place), so cached instances
+    must never be returned directly; ``package`` is intentionally left unset,
+    per the interface contract for listing / revision info calls.
+    """
+    return PackageRevisionInfo(revision.package_id,
+                               revision.revision,
+                               revision.created,
+                               revision.author,
+                               revision.description)
+
+
+def _copy_tag(tag):
+    # type: (TagInfo) -> TagInfo
+    """Copy a cached tag before handing it to a caller
+
+    Like :func:`_copy_revision`, this keeps caller-side mutation from leaking
+    into the cache; ``revision`` is left unset, as in all tag listing calls.
+    """
+    return TagInfo(tag.package_id,
+                   tag.name,
+                   tag.created,
+                   tag.revision_ref,
+                   tag.author,
+                   description=tag.description)
+
+
 def _parse_rev_log(package_id, rev_data):
     # type: (str, Dict[str, Any]) -> PackageRevisionInfo
     """Parse a line from the revision log and return a RevisionInfo object
     """
-    author = _get_author(rev_data)
-    return PackageRevisionInfo(package_id=package_id,
-                               revision=rev_data['revision'],
-                               created=isoparse(rev_data['created']),
-                               author=author,
-                               description=rev_data['description'])
+    # Positional construction; keyword-argument binding is measurable when
+    # this runs once per log line on revision_list
+    return PackageRevisionInfo(package_id,
+                               rev_data['revision'],
+                               _parse_datetime(rev_data['created']),
+                               _get_author(rev_data),
+                               rev_data['description'])
 
 
 def _tag_file_to_taginfo(package_id, tag_name, tag_data):
     # type: (str, str, Dict[str, Any]) -> TagInfo
-    author = _get_author(tag_data)
-    return TagInfo(package_id=package_id,
-                   name=tag_name,
-                   created=isoparse(tag_data['created']),
-                   revision_ref=tag_data['revision'],
-                   description=tag_data['description'],
-                   author=author)
+    return TagInfo(package_id,
+                   tag_name,
+                   _parse_datetime(tag_data['created']),
+                   tag_data['revision'],
+                   _get_author(tag_data),
+                   description=tag_data['description'])
 
 
 def _get_author(record):
     # type: (Dict[str, Any]) -> Optional[Author]
-    if 'author_name' in record or 'author_email' in record:
-        author = Author(name=record.get('author_name'),
-                        email=record.get('author_email'))
-    else:
-        author = None
-    return author
+    name = record.get('author_name')
+    email = record.get('author_email')
+    if name is None and email is None:
+        return None
+    return Author(name, email)
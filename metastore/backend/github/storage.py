@@ -5,13 +5,14 @@ This backend stores datasets as GitHub repositories, utilizing Git's built-in
 revisions and tags. This implementation is based on GitHub's Web API, and will
 not support other Git hosting services.
 """
-import json
+import base64
+from collections import OrderedDict
 from typing import Any, Dict, List, Optional, Tuple, Union
 
 from metastore.backend import StorageBackend, exc
 from metastore.backend import git_lfs_helpers as lfs_helpers
 from metastore.types import Author, PackageRevisionInfo, TagInfo
-from metastore.util import is_hex_str
+from metastore.util import is_hex_str, json_dumps, json_loadb
 
 from . import gh_rest_api as gh
 
@@ -29,25 +30,41 @@ class GitHubStorage(StorageBackend):
     DEFAULT_COMMIT_MESSAGE = 'Datapackage updated'
     DEFAULT_TAG_MESSAGE = 'Tagging revision'
 
+    BLOB_CACHE_SIZE = 512
+
     def __init__(self, github_options, lfs_server_url=None, default_owner=None, default_author=None,
-                 default_branch=DEFAULT_BRANCH, default_commit_message=DEFAULT_COMMIT_MESSAGE, private=False):
-        # type: (Dict[str, Any], Optional[str], Optional[str], Optional[Author], Optional[str], Optional[str]) -> None
+                 default_branch=DEFAULT_BRANCH, default_commit_message=DEFAULT_COMMIT_MESSAGE, private=False,
+                 cache_repo_handles=False):
+        # type: (Dict[str, Any], Optional[str], Optional[str], Optional[Author], Optional[str], Optional[str], bool, bool) -> None  # noqa: E501
         self.gh = gh.Github(**github_options)
         self._lfs_server_url = lfs_server_url
         self._default_owner = default_owner
         self._default_author = default_author
         self._default_branch = default_branch
+        self._default_head_ref = 'heads/' + default_branch
         self._default_commit_message = default_commit_message
         self._user = None
+        self._org_cache = {}  # type: Dict[str, gh.Organization]
         self._private = private
+        # Repository handles, keyed by (owner, repo name); only used if
+        # cache_repo_handles is enabled
+        self._cache_repo_handles = cache_repo_handles
+        self._repo_cache = {}  # type: Dict[Tuple[str, str], gh.Repository]
+        # Raw datapackage.json blobs, keyed by (repo full name, commit sha)
+        self._blob_cache = OrderedDict()  # type: OrderedDict[Tuple[str, str], bytes]
+        # InputGitAuthor instances, keyed by (name, email)
+        self._author_cache = {}  # type: Dict[Tuple[Optional[str], Optional[str]], gh.InputGitAuthor]
 
     def create(self, package_id, metadata, author=None, message=None):
         owner, repo_name = self._parse_id(package_id)
-        datapackage = _create_file('datapackage.json', json.dumps(metadata, indent=2))
-        files = [datapackage] + self._create_lfs_files(metadata)
+        lfs_files = self._create_lfs_files(metadata)
 
         try:
-            repo = self._get_owner(owner).create_repo(repo_name, private=self._private)
+            # auto_init gives us an initial commit to build on, so README.md
+            # and datapackage.json land together in a single follow-up commit
+            # through the low-level Git API, instead of paying one contents
+            # API commit per file
+            repo = self._get_owner(owner).create_repo(repo_name, private=self._private, auto_init=True)
         except gh.GithubException as e:
             if e.status == 422 and e.data['errors'][0]['message'] == 'name already exists on this account':
                 raise exc.Conflict("Datapackage with the same ID already exists")
@@ -57,11 +74,11 @@ class GitHubStorage(StorageBackend):
             message = 'Initial datapackage commit'
 
         try:
-            # Create an initial README.md file so we can start using the low-level Git API
-            repo.create_file('README.md', 'Initialize data repository', self.DEFAULT_README,
-                             branch=self._default_branch)
-            head = repo.get_branch(self._default_branch)
-            commit = self._create_commit(repo, files, head.commit, author, message)
+            datapackage = _create_file('datapackage.json', json_dumps(metadata, pretty=True), repo)
+            readme = _create_file('README.md', self.DEFAULT_README, repo)
+            files = [datapackage, readme] + lfs_files
+            head = self._get_initial_branch(repo)
+            commit = self._create_commit(repo, files, _branch_head_commit(repo, head), author, message)
         except Exception as e:
             try:
                 self.delete(package_id)
@@ -77,8 +94,10 @@ class GitHubStorage(StorageBackend):
             repo = self._get_repo(package_id)
         try:
             if not revision_ref:
-                ref = repo.get_git_ref('heads/{}'.format(self._default_branch))
-                assert ref.object.type == 'commit'
+                ref = repo.get_git_ref(self._default_head_ref)
+                if ref.object.type != 'commit':
+                    raise exc.NotFound(
+                        'Default branch of {} does not point to a commit: {}'.format(package_id, ref.object.type))
                 revision_ref = ref.object.sha
             elif not self.is_valid_revision_id(revision_ref):
                 tag = self.tag_fetch(package_id, revision_ref, repo=repo)
@@ -90,15 +109,7 @@ class GitHubStorage(StorageBackend):
         except gh.UnknownObjectException:
             raise exc.NotFound('Could not find package {}@{}'.format(package_id, revision_ref))
 
-        # Get the blob for datapackage.json in that commit
-        try:
-            blob = repo.get_contents('datapackage.json', revision_ref)
-            datapackage = json.loads(blob.decoded_content)
-        except gh.UnknownObjectException:
-            raise exc.NotFound("datapackage.json file not found for {}@{}".format(package_id, revision_ref))
-        except ValueError:
-            raise ValueError("Unable to parse datapackage.json file in {}@{}".format(package_id, revision_ref))
-
+        datapackage = self._fetch_datapackage(repo, package_id, revision_ref)
         author = Author(commit.author.name, commit.author.email)
         return PackageRevisionInfo(package_id, commit.sha, commit.author.date, author, commit.message, datapackage)
 
@@ -116,15 +127,16 @@ class GitHubStorage(StorageBackend):
             parent.package.update(metadata)
             metadata = parent.package
 
-        datapackage = _create_file('datapackage.json', json.dumps(metadata, indent=2))
+        datapackage = _create_file('datapackage.json', json_dumps(metadata, pretty=True), repo)
         files = [datapackage] + self._create_lfs_files(metadata)
-        commit = self._create_commit(repo, files, head.commit, author, message)
+        commit = self._create_commit(repo, files, _branch_head_commit(repo, head), author, message)
         c_author = Author(commit.author.name, commit.author.email)
         return PackageRevisionInfo(package_id, commit.sha, commit.author.date, c_author, message, metadata)
 
     def delete(self, package_id):
         repo = self._get_repo(package_id)
         repo.delete()
+        self._repo_cache.pop(self._parse_id(package_id), None)
 
     def revision_list(self, package_id):
         repo = self._get_repo(package_id)
@@ -150,7 +162,10 @@ class GitHubStorage(StorageBackend):
         tag_refs = _get_git_matching_refs(repo, 'tags/')
         tags = []
         for ref in tag_refs:
-            tags.append(self._tag_ref_to_taginfo(package_id, repo, ref))
+            # Skip resolving each tag's referenced revision when listing; this
+            # saves two API calls per tag and matches the filesystem backend,
+            # where only tag_fetch populates the revision attribute
+            tags.append(self._tag_ref_to_taginfo(package_id, repo, ref, fetch_revision=False))
         return tags
 
     def tag_fetch(self, package_id, tag, repo=None):
@@ -202,8 +217,9 @@ class GitHubStorage(StorageBackend):
         """Verify that the package ID looks like something we can work with and parse
         it into GitHub owner (user or org) and repo name
         """
-        if '/' in package_id:
-            return tuple(package_id.split('/', 1))
+        owner, sep, repo_name = package_id.partition('/')
+        if sep:
+            return owner, repo_name
         elif self._default_owner:
             return self._default_owner, package_id
         else:
@@ -211,35 +227,95 @@ class GitHubStorage(StorageBackend):
 
     def _get_owner(self, owner):
         # type: (str) -> Union[gh.AuthenticatedUser, gh.Organization]
+        """Get the user or organization object owning a repository
+
+        The authenticated user is fetched once per instance; organization
+        objects are memoized per owner name, so repeated operations on
+        packages of the same org skip the lookup round-trip.
+        """
         if self._user is None:
             self._user = self.gh.get_user()
         if owner == self._user.login:
             return self._user
-        else:
-            return self.gh.get_organization(owner)
+        org = self._org_cache.get(owner)
+        if org is None:
+            org = self.gh.get_organization(owner)
+            self._org_cache[owner] = org
+        return org
 
     def _get_repo(self, package_id):
         # type: (str) -> gh.Repository
         """Get repository object for package_id, validating that it really
         exists
+
+        If the backend was created with ``cache_repo_handles=True``,
+        repository handles are cached for the lifetime of the backend
+        instance, so repeated operations on the same package do not repeat
+        the repository lookup round-trip. The cache is invalidated by
+        :meth:`delete`, but cannot detect repositories deleted or renamed
+        from outside this instance - hence the opt-in.
         """
-        owner, repo_name = self._parse_id(package_id)
+        key = self._parse_id(package_id)
+        repo = self._repo_cache.get(key)
+        if repo is None:
+            try:
+                repo = self._get_owner(key[0]).get_repo(key[1])
+            except gh.UnknownObjectException:
+                raise exc.NotFound('Could not find package {}'.format(package_id))
+            if self._cache_repo_handles:
+                self._repo_cache[key] = repo
+        return repo
+
+    def _fetch_datapackage(self, repo, package_id, revision_ref):
+        # type: (gh.Repository, str, str) -> Dict[str, Any]
+        """Get the parsed datapackage.json blob for a specific commit
+
+        Revisions are immutable, so raw blob contents are cached by commit
+        sha and only downloaded once per (repo, revision) within this
+        instance. The blob is parsed fresh on every call, even cache hits,
+        as callers are free to mutate the returned dict.
+        """
+        cache_key = (repo.full_name, revision_ref)
+        raw_blob = self._blob_cache.get(cache_key)
+        if raw_blob is None:
+            try:
+                raw_blob = repo.get_contents('datapackage.json', revision_ref).decoded_content
+            except gh.UnknownObjectException:
+                raise exc.NotFound("datapackage.json file not found for {}@{}".format(package_id, revision_ref))
+            self._blob_cache[cache_key] = raw_blob
+            if len(self._blob_cache) > self.BLOB_CACHE_SIZE:
+                self._blob_cache.popitem(last=False)
         try:
-            return self._get_owner(owner).get_repo(repo_name)
-        except gh.UnknownObjectException:
-            raise exc.NotFound('Could not find package {}'.format(package_id))
+            return json_loadb(raw_blob)
+        except ValueError:
+            raise ValueError("Unable to parse datapackage.json file in {}@{}".format(package_id, revision_ref))
+
+    def _get_initial_branch(self, repo):
+        # type: (gh.Repository) -> Any
+        """Get the branch head created by repository auto-init
+
+        If the account is configured to name its default branch differently
+        from our configured default branch, create the latter off the
+        auto-init commit first.
+        """
+        try:
+            return repo.get_branch(self._default_branch)
+        except gh.GithubException:
+            init_branch = repo.get_branch(repo.default_branch)
+            repo.create_git_ref('refs/heads/{}'.format(self._default_branch), init_branch.commit.sha)
+            return repo.get_branch(self._default_branch)
 
     def _create_commit(self, repo, files, parent_commit, author, message):
-        # type: (gh.Repository, List[gh.InputGitTreeElement], gh.Commit, Optional[Author], str) -> gh.GitCommit
+        # type: (gh.Repository, List[gh.InputGitTreeElement], gh.GitCommit.GitCommit, Optional[Author], str) -> gh.GitCommit.GitCommit  # noqa: E501
         """Create a git Commit
         """
         # Create tree
-        tree = repo.create_git_tree(files, parent_commit.commit.tree)
+        tree = repo.create_git_tree(files, parent_commit.tree)
         # Create commit
         author = self._verify_author(author)
-        commit = repo.create_git_commit(message, tree, [parent_commit.commit], author=author)
+        commit = repo.create_git_commit(message, tree, [parent_commit], author=author)
         # Update refs
-        ref = repo.get_git_ref('heads/{}'.format(self._default_branch))
+        ref = repo.get_git_ref(self._default_head_ref)
         ref.edit(commit.sha)
 
         return commit
@@ -267,18 +343,36 @@ class GitHubStorage(StorageBackend):
         """Check we have an author and return something Git can use to set commit / tag author
         """
         if author and (author.name or author.email):
-            return gh.InputGitAuthor(author.name, author.email)
+            return self._git_author(author.name, author.email)
         elif self._default_author:
-            return gh.InputGitAuthor(self._default_author.name, self._default_author.email)
+            return self._git_author(self._default_author.name, self._default_author.email)
         else:
             return gh.NotSet
 
-    def _tag_ref_to_taginfo(self, package_id, repo, ref):
-        # type: (str, gh.Repository, gh.GitRef) -> TagInfo
+    def _git_author(self, name, email):
+        # type: (Optional[str], Optional[str]) -> gh.InputGitAuthor
+        """Get a (memoized) InputGitAuthor instance for the given name / email
+
+        Authors repeat heavily across commits and tags (most often it is just
+        the configured default author), so instances are kept and reused
+        """
+        key = (name, email)
+        git_author = self._author_cache.get(key)
+        if git_author is None:
+            git_author = gh.InputGitAuthor(name, email)
+            self._author_cache[key] = git_author
+        return git_author
+
+    def _tag_ref_to_taginfo(self, package_id, repo, ref, fetch_revision=True):
+        # type: (str, gh.Repository, gh.GitRef, bool) -> TagInfo
         """Convert a GitRef for a tag into a TagInfo object
+
+        If :param:`fetch_revision` is False, the revision attribute of the
+        returned object will not be set; the revision SHA is still available
+        as ``revision_ref``
         """
         tag_obj = repo.get_git_tag(ref.object.sha)
-        revision = self.revision_fetch(package_id, tag_obj.object.sha, repo=repo)
+        revision = self.revision_fetch(package_id, tag_obj.object.sha, repo=repo) if fetch_revision else None
         author = Author(tag_obj.tagger.name, tag_obj.tagger.email)
         return TagInfo(package_id, tag_obj.tag, tag_obj.tagger.date, tag_obj.object.sha, author, revision,
                        tag_obj.message)
@@ -313,10 +407,20 @@ class GitHubStorage(StorageBackend):
         return files
 
 
-def _create_file(path, content):
-    # type: (str, bytes) -> gh.InputGitTreeElement
-    element = gh.InputGitTreeElement(path, '100644', 'blob', content=content)
-    return element
+# Content larger than this is uploaded as a standalone git blob rather than
+# inlined into the create-tree request body, where base64 inflates it ~1.33x
+# and counts towards the API's tree object size limit
+_INLINE_CONTENT_LIMIT = 64 * 1024
+
+
+def _create_file(path, content, repo=None):
+    # type: (str, Union[str, bytes], Optional[gh.Repository]) -> gh.InputGitTreeElement
+    if repo is not None and len(content) >= _INLINE_CONTENT_LIMIT:
+        if not isinstance(content, bytes):
+            content = content.encode('utf8')
+        blob = repo.create_git_blob(base64.b64encode(content).decode('ascii'), 'base64')
+        return gh.InputGitTreeElement(path, '100644', 'blob', sha=blob.sha)
+    return gh.InputGitTreeElement(path, '100644', 'blob', content=content)
 
 
 def _commit_to_revinfo(package_id, commit):
@@ -330,6 +434,19 @@ def _commit_to_revinfo(package_id, commit):
                                commit.commit.message)
 
 
+def _branch_head_commit(repo, branch):
+    # type: (gh.Repository, Any) -> gh.GitCommit.GitCommit
+    """Build a GitCommit handle for a branch's head commit
+
+    The branch payload already embeds the head git commit, including its
+    tree sha, so committing on top of it does not require lazily re-fetching
+    the commit object from the API as ``branch.commit.commit`` would.
+    """
+    raw = branch.raw_data['commit']
+    attributes = dict(raw['commit'], sha=raw['sha'])
+    return gh.GitCommit.GitCommit(repo._requester, {}, attributes, completed=True)
+
+
 def _get_git_matching_refs(repo, ref):
     """This is back-ported from PyGithub 1.51 to support Python 2.7 which is no
     longer supported for that version.
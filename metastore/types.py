@@ -1,7 +1,7 @@
 """Data classes for packages & related models
 """
-from datetime import datetime
-from typing import Any, Dict, Optional
+from datetime import datetime  # noqa: F401
+from typing import Any, Dict, Optional  # noqa: F401
 
 # Python type definition for datapackage.json dicts
 # This may be further specified in the future (esp. if Python 2.x support is dropped)
@@ -9,13 +9,15 @@ DataPackageType = Dict[str, Any]
 
 
 # Data classes. If this was Python 3.7+, we could have used dataclasses here ;)
+# __slots__ keeps instances compact, which matters for revision_list / tag_list
+# calls that allocate one object per log entry
 class Author(object):
     """Revision / tag author information
     """
-    name = None  # type: Optional[str]
-    email = None  # type: Optional[str]
+    __slots__ = ('name', 'email')
 
     def __init__(self, name=None, email=None):
+        # type: (Optional[str], Optional[str]) -> None
         self.name = name
         self.email = email
 
@@ -29,14 +31,10 @@ class Author(object):
 class PackageRevisionInfo(object):
     """Revision information
     """
-    package_id = None  # type: str
-    revision = None  # type: str
-    created = None  # type: datetime
-    author = None  # type: Optional[Author]
-    description = None  # type: Optional[str]
-    package = None  # type: Optional[DataPackageType]
+    __slots__ = ('package_id', 'revision', 'created', 'author', 'description', 'package')
 
     def __init__(self, package_id, revision, created, author=None, description=None, package=None):
+        # type: (str, str, datetime, Optional[Author], Optional[str], Optional[DataPackageType]) -> None
         self.package_id = package_id
         self.revision = revision
         self.created = created
@@ -51,15 +49,10 @@ class PackageRevisionInfo(object):
 class TagInfo(object):
     """Tag information
     """
-    package_id = None  # type: str
-    name = None  # type: str
-    created = None  # type: datetime
-    revision_ref = None  # type: str
-    author = None  # type: Optional[Author]
-    revision = None  # type: Optional[PackageRevisionInfo]
-    description = None  # type: Optional[str]
+    __slots__ = ('package_id', 'name', 'created', 'revision_ref', 'author', 'revision', 'description')
 
     def __init__(self, package_id, name, created, revision_ref, author=None, revision=None, description=None):
+        # type: (str, str, datetime, str, Optional[Author], Optional[PackageRevisionInfo], Optional[str]) -> None
         self.package_id = package_id
         self.name = name
         self.created = created
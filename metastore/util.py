@@ -1,5 +1,18 @@
+# coding=utf-8
 import importlib
-from typing import Callable, Optional
+import json
+from typing import Any, Callable, Optional, Union  # noqa: F401
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speedup, fall back to stdlib json
+    orjson = None  # type: ignore
+
+# Pre-built stdlib encoders for the non-orjson fallback paths; building the
+# encoder once avoids per-call construction, and circular reference checking
+# is skipped since we only serialize plain data fresh off the wire / caller
+_encode_compact = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), check_circular=False).encode
+_encode_pretty = json.JSONEncoder(ensure_ascii=False, indent=2, check_circular=False).encode
 
 
 def get_callable(callable_str, base_package=None):
@@ -25,6 +38,63 @@ def get_callable(callable_str, base_package=None):
     return getattr(module, callable_name)  # type: ignore
 
 
+def json_dumpb(obj):
+    # type: (Any) -> bytes
+    """Serialize an object to compact UTF-8 encoded JSON bytes
+
+    Uses ``orjson`` when it is installed, falling back to the stdlib ``json``
+    module with compact separators otherwise. Non-ASCII text is written as
+    raw UTF-8 rather than ``\\uXXXX`` escapes, matching orjson's output.
+
+    >>> json_dumpb({"name": "mydataset"}) == b'{"name":"mydataset"}'
+    True
+
+    >>> json_dumpb({"description": u"détails"}) == b'{"description":"d\\xc3\\xa9tails"}'
+    True
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return _encode_compact(obj).encode('utf8')
+
+
+def json_dumps(obj, pretty=False):
+    # type: (Any, bool) -> str
+    """Serialize an object to a JSON string, optionally 2-space indented
+
+    Uses ``orjson`` when it is installed, falling back to the stdlib ``json``
+    module otherwise.
+
+    >>> json_dumps({"name": "mydataset"}) == '{"name":"mydataset"}'
+    True
+    """
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        return orjson.dumps(obj, option=option).decode('utf8')
+    if pretty:
+        return _encode_pretty(obj)
+    return _encode_compact(obj)
+
+
+def json_loadb(data):
+    # type: (Union[bytes, str]) -> Any
+    """Parse JSON from UTF-8 encoded bytes (or a string)
+
+    Uses ``orjson`` when it is installed, falling back to the stdlib ``json``
+    module otherwise.
+
+    >>> json_loadb(b'{"name":"mydataset"}') == {"name": "mydataset"}
+    True
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# Characters allowed in hex-only strings; a frozenset containment check is
+# cheaper than int(value, 16) and doesn't accept whitespace / sign / 0x prefixes
+_HEX_CHARS = frozenset('0123456789abcdefABCDEF')
+
+
 def is_hex_str(value, chars=40):
     # type: (str, int) -> bool
     """Check if a string is a hex-only string of exactly :param:`chars` characters length.
@@ -51,11 +121,10 @@ def is_hex_str(value, chars=40):
 
     >>> is_hex_str('ef42bab1191da272f13935.78c401e3de0c11afb')
     False
+
+    >>> is_hex_str('0xf2bab1191da272f13935f78c401e3de0c11afb')
+    False
     """
     if len(value) != chars:
         return False
-    try:
-        int(value, 16)
-    except ValueError:
-        return False
-    return True
+    return _HEX_CHARS.issuperset(value)
@@ -25,5 +25,10 @@ setup(
         'fs',
         'pygithub',
     ],
+    extras_require={
+        # Optional faster JSON serialization, used by metastore.util when
+        # available; orjson has no Python 2 builds
+        'fast': ['orjson; python_version >= "3.6"'],
+    },
     package_data={}
 )
@@ -4,7 +4,7 @@ import pytest
 
 from metastore.backend.filesystem import FilesystemStorage
 
-from . import CommonBackendTestSuite
+from . import CommonBackendTestSuite, create_test_datapackage
 
 
 @pytest.fixture()
@@ -13,4 +13,24 @@ def backend():
 
 
 class TestFilesystemBackend(CommonBackendTestSuite):
-    pass
+
+    def test_revision_info_package_not_set_after_fetch(self, backend):
+        """Cached revision info must not be polluted by fetch / partial update
+        setting the package attribute on the objects they return
+        """
+        p1 = backend.create(self.dataset_id('mydataset'), create_test_datapackage('mydataset'))
+        backend.fetch(p1.package_id)
+        backend.update(p1.package_id, {"type": "csv"}, partial=True)
+
+        assert backend.revision_fetch(p1.package_id, p1.revision).package is None
+        for rev in backend.revision_list(p1.package_id):
+            assert rev.package is None
+
+    def test_fetch_results_not_aliased(self, backend):
+        p1 = backend.create(self.dataset_id('mydataset'), create_test_datapackage('mydataset'))
+        backend.update(p1.package_id, create_test_datapackage('mydataset', type='csv'))
+
+        old = backend.fetch(p1.package_id, revision_ref=p1.revision)
+        latest = backend.fetch(p1.package_id)
+        assert old is not latest
+        assert 'type' not in old.package